@@ -1,18 +1,24 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import csv
 import os
+import shelve
+import subprocess
 import sys
 import time
-import webbrowser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from operator import itemgetter
 
+import aiohttp
 import numpy as np
-import requests
+import orjson
+from numba import njit
 from tqdm import tqdm
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
 
 # ----------------------------
 # Self-contained script setup
@@ -29,7 +35,25 @@ if script_dir not in sys.path:
 BASE_URL = "https://api.exchange.coinbase.com"
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 GRANULARITY = 86400  # daily candles
-RATE_LIMIT_SLEEP = 0.35  # ~3 requests/sec safety
+RATE_LIMIT = 3  # requests/sec (Coinbase public endpoint limit)
+MAX_CONCURRENCY = 6  # pairs in flight / open connections
+REQUEST_TIMEOUT = 30  # seconds
+MAX_RETRIES = 3  # retries for rate-limited / transient server errors
+RETRY_BACKOFF = 0.3  # seconds, doubled on every retry
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "coinbase_volatility")
+PREFILTER_VOLUME_FACTOR = 0.5  # skip pairs whose 24h volume is below this fraction of the volume threshold
+PRODUCTS_CACHE_TTL = 3600  # seconds; listings and trading status can change during the day
+PAIR_INFO_CACHE_TTL = 86400  # seconds; min_market_funds is almost static
+
+# Excel styling (shared objects, created once)
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_ALIGN = Alignment(horizontal="center", vertical="center")
+FMT_DECIMAL = '0.00'     # 2 decimal places
+FMT_THOUSANDS = '#,##0'  # commas, no decimals
+FMT_INTEGER = '0'
+_VALID_STATUS = frozenset({None, "online", "active", "online_trading"})
 
 # ----------------------------
 # Date window: will be calculated in main() based on --days parameter
@@ -45,10 +69,43 @@ def iso_format(dt: datetime) -> str:
     return dt.isoformat()
 
 
-def calculate_percentage_change(low: float, high: float) -> float:
-    if low <= 0:
+@njit(cache=True, nogil=True)
+def _daily_stats_nb(candles, days):
+    """
+    Numba kernel for the per-pair daily filters. Expects a contiguous float64 candle
+    array ordered newest -> oldest, as returned by the candles endpoint.
+    
+    Returns (median % range low->high over the latest `days` candles, median volume
+    over all candles, mean daily range as % of close over the latest `days` candles).
+    """
+    n = candles.shape[0]
+    pct_changes = np.zeros(days)
+    atr_sum = 0.0
+    for i in range(days):
+        low = candles[i, 1]
+        high = candles[i, 2]
+        close = candles[i, 4]
+        if low > 0:
+            pct_changes[i] = (high - low) / low * 100.0
+        if close > 0:
+            atr_sum += (high - low) / close
+    median_pct = np.median(pct_changes) if days > 0 else 0.0
+    median_volume = np.median(candles[:, 5].copy()) if n > 0 else 0.0
+    daily_atr_pct = atr_sum / days * 100.0 if days > 0 else 0.0
+    return median_pct, median_volume, daily_atr_pct
+
+
+def fast_median(values) -> float:
+    """Median via np.partition (O(n) selection); much cheaper than np.median on small arrays. 0.0 if empty."""
+    values = np.asarray(values, dtype=np.float64)
+    n = values.size
+    if n == 0:
         return 0.0
-    return (high - low) / low * 100.0
+    mid = n // 2
+    if n % 2:
+        return float(np.partition(values, mid)[mid])
+    part = np.partition(values, (mid - 1, mid))
+    return float((part[mid - 1] + part[mid]) / 2)
 
 
 def safe_file_operation(operation_func, file_path: str, operation_name: str, max_retries: int = 10):
@@ -113,87 +170,75 @@ def safe_write_file(file_path: str, write_func, operation_name: str) -> bool:
     return safe_file_operation(write_operation, file_path, operation_name)
 
 
+_CACHE_MISS = object()
+
+
+def cache_get(name: str, key: str, max_age: float, default=_CACHE_MISS):
+    """
+    Read a value from the on-disk cache.
+    
+    Returns default on a miss, if the entry is older than max_age seconds,
+    or if the cache is unavailable.
+    """
+    try:
+        with shelve.open(os.path.join(CACHE_DIR, name)) as db:
+            stored_at, value = db[key]
+        if time.time() - stored_at > max_age:
+            return default
+        return value
+    except Exception:
+        return default
+
+
+def cache_set(name: str, key: str, value) -> None:
+    """Store a timestamped value in the on-disk cache. Caching is best-effort, so failures are ignored."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with shelve.open(os.path.join(CACHE_DIR, name)) as db:
+            db[key] = (time.time(), value)
+    except Exception:
+        pass
+
+
 def open_file(file_path: str) -> bool:
     """Open file with the default application."""
     try:
         # Convert to absolute path for better compatibility
         abs_path = os.path.abspath(file_path)
         
-        # Use webbrowser to open files (works cross-platform)
-        webbrowser.open(f"file://{abs_path}")
+        # Launch the OS default application for the file type (e.g. Excel for .xlsx)
+        if sys.platform == "win32":
+            os.startfile(abs_path)
+        else:
+            # Detach the launcher's output so it doesn't clutter the console
+            opener = "open" if sys.platform == "darwin" else "xdg-open"
+            subprocess.Popen([opener, abs_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         return True
     except Exception as e:
         print(f"Warning: Could not auto-open file: {e}")
         return False
 
 
-def create_excel_file(output_file: str) -> Workbook:
-    """Create a new Excel workbook with headers and formatting."""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Volatility Analysis"
-    
-    # Add headers
-    headers = ["Pair", "Volatility", "Volume", "MinFunds", "MedLong%", "MaxLong%", "MedShort%", "MaxShort%", "Sessions"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    return wb
-
-
-def save_to_excel(pair: str, median_pct_change: float, volume: float, min_order_size, supertrend_stats: dict, wb: Workbook) -> None:
-    """Add data row to Excel workbook."""
-    ws = wb.active
-    row = ws.max_row + 1
-    
-    # Add data as numeric values (Excel will handle formatting)
-    ws.cell(row=row, column=1, value=pair)
-    ws.cell(row=row, column=2, value=median_pct_change)
-    ws.cell(row=row, column=3, value=int(volume) if volume > 0 else 0)
-    
-    # Ensure MinFunds is stored as a number
-    if min_order_size == "N/A":
-        ws.cell(row=row, column=4, value=0)
-    else:
-        try:
-            # Convert to float to ensure it's a number
-            ws.cell(row=row, column=4, value=float(min_order_size))
-        except (ValueError, TypeError):
-            ws.cell(row=row, column=4, value=0)
+def create_excel_file(pairs_data: list) -> Workbook:
+    """
+    Create a write-only Excel workbook with column widths and a styled header row.
     
-    # Add SuperTrend data
-    ws.cell(row=row, column=5, value=supertrend_stats['avg_long_session_pct'])
-    ws.cell(row=row, column=6, value=supertrend_stats['max_long_session_pct'])
-    ws.cell(row=row, column=7, value=supertrend_stats['avg_short_session_pct'])
-    ws.cell(row=row, column=8, value=supertrend_stats['max_short_session_pct'])
-    ws.cell(row=row, column=9, value=supertrend_stats['total_sessions'])
-
-
-def format_excel_file(wb: Workbook) -> None:
-    """Format Excel file with auto-sized columns and styling."""
-    ws = wb.active
+    Write-only worksheets are streamed to disk in append order, so column widths
+    are sized from pairs_data up front and rows must be appended already sorted.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Volatility Analysis")
     
     # Set specific column widths for better appearance
-    # Pair column (A) - auto-size based on content
-    max_pair_length = 0
-    for row in range(1, ws.max_row + 1):
-        cell_value = str(ws.cell(row=row, column=1).value or "")
-        if len(cell_value) > max_pair_length:
-            max_pair_length = len(cell_value)
+    # Pair column (A) - auto-size based on content (header included)
+    max_pair_length = max([len("Pair")] + [len(p['pair']) for p in pairs_data])
     ws.column_dimensions['A'].width = min(max_pair_length + 2, 20)
     
     # Volatility column (B) - fixed width for 2 decimal places
     ws.column_dimensions['B'].width = 12
     
     # Volume column (C) - wider for large numbers with commas
-    max_volume_length = 0
-    for row in range(1, ws.max_row + 1):
-        cell_value = str(ws.cell(row=row, column=3).value or "")
-        if len(cell_value) > max_volume_length:
-            max_volume_length = len(cell_value)
+    max_volume_length = max([len("Volume")] + [len(str(int(p['median_volume']) if p['median_volume'] > 0 else 0)) for p in pairs_data])
     ws.column_dimensions['C'].width = min(max_volume_length + 3, 25)
     
     # MinFunds column (D) - fixed width for currency
@@ -206,206 +251,176 @@ def format_excel_file(wb: Workbook) -> None:
     ws.column_dimensions['H'].width = 12  # MaxShort%
     ws.column_dimensions['I'].width = 10  # Sessions
     
-    # Format specific columns
-    # Volatility column (B) - 2 decimal places
-    for row in range(2, ws.max_row + 1):
-        cell = ws.cell(row=row, column=2)
-        cell.number_format = '0.00'
-    
-    # Volume column (C) - Number format with commas (no decimals)
-    for row in range(2, ws.max_row + 1):
-        cell = ws.cell(row=row, column=3)
-        cell.number_format = '#,##0'
-    
-    # MinFunds column (D) - Simple number format to avoid green triangles
-    for row in range(2, ws.max_row + 1):
-        cell = ws.cell(row=row, column=4)
-        # Use simple number format without currency symbol
-        cell.number_format = '0.00'
-    
-    # SuperTrend columns (E-H) - 2 decimal places for percentages
-    for col in range(5, 9):  # Columns E through H
-        for row in range(2, ws.max_row + 1):
-            cell = ws.cell(row=row, column=col)
-            cell.number_format = '0.00'
-    
-    # Sessions column (I) - Integer format
-    for row in range(2, ws.max_row + 1):
-        cell = ws.cell(row=row, column=9)
-        cell.number_format = '0'
-
-
-def sort_excel_by_volatility(wb: Workbook) -> None:
-    """Sort Excel data by volatility (highest first)."""
-    ws = wb.active
-    
-    # Get all data rows (excluding header)
-    data_rows = []
-    for row in range(2, ws.max_row + 1):
-        row_data = []
-        for col in range(1, 5):  # 4 columns
-            row_data.append(ws.cell(row=row, column=col).value)
-        data_rows.append(row_data)
-    
-    # Sort by volatility (column 1) in descending order
-    data_rows.sort(key=lambda x: float(x[1]) if x[1] is not None else 0, reverse=True)
-    
-    # Clear data rows and rewrite sorted data
-    for row in range(2, ws.max_row + 1):
-        for col in range(1, 5):
-            ws.cell(row=row, column=col, value="")
-    
-    # Write sorted data
-    for i, row_data in enumerate(data_rows, start=2):
-        for j, value in enumerate(row_data, start=1):
-            ws.cell(row=i, column=j, value=value)
-
-
-def save_to_csv(pair: str, median_pct_change: float, volume: float, min_order_size, supertrend_stats: dict, output_file: str) -> bool:
-    """Save data to CSV file with safe file handling. Returns True if successful, False if cancelled."""
-    header = ["Pair", "Volatility", "Volume", "MinFunds", "MedLong%", "MaxLong%", "MedShort%", "MaxShort%", "Sessions"]
-    file_exists = os.path.exists(output_file)
-    
-    def write_operation():
-        with open(output_file, "a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(header)
-            # Format: Volatility to 2 decimal places, Volume as integer with commas
-            formatted_volume = f"{int(volume):,}" if volume > 0 else "0"
-            writer.writerow([
-                pair, 
-                f"{median_pct_change:.2f}", 
-                formatted_volume, 
-                min_order_size,
-                f"{supertrend_stats['avg_long_session_pct']:.2f}",
-                f"{supertrend_stats['max_long_session_pct']:.2f}",
-                f"{supertrend_stats['avg_short_session_pct']:.2f}",
-                f"{supertrend_stats['max_short_session_pct']:.2f}",
-                supertrend_stats['total_sessions']
-            ])
-        return True
+    # Add headers
+    headers = ["Pair", "Volatility", "Volume", "MinFunds", "MedLong%", "MaxLong%", "MedShort%", "MaxShort%", "Sessions"]
+    header_row = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = HEADER_ALIGN
+        header_row.append(cell)
+    ws.append(header_row)
     
-    return safe_file_operation(write_operation, output_file, "write to CSV file")
+    return wb
 
 
-def sort_csv_by_median(output_file: str) -> bool:
-    """Sort CSV file by volatility with safe file handling. Returns True if successful, False if cancelled."""
-    if not os.path.exists(output_file):
-        return True
+def _excel_cell(ws, value, number_format: str) -> WriteOnlyCell:
+    """Create a write-only cell with its number format applied."""
+    cell = WriteOnlyCell(ws, value=value)
+    cell.number_format = number_format
+    return cell
+
+
+def save_to_excel(pair: str, median_pct_change: float, volume: float, min_order_size, supertrend_stats: dict, wb: Workbook) -> None:
+    """Append a data row to the write-only Excel workbook."""
+    ws = wb.worksheets[0]
+    
+    # Ensure MinFunds is stored as a number
+    if min_order_size == "N/A":
+        min_funds = 0
+    else:
+        try:
+            # Convert to float to ensure it's a number
+            min_funds = float(min_order_size)
+        except (ValueError, TypeError):
+            min_funds = 0
+    
+    # Add data as numeric values, formatted per column
+    ws.append([
+        pair,
+        _excel_cell(ws, median_pct_change, FMT_DECIMAL),                  # Volatility
+        _excel_cell(ws, int(volume) if volume > 0 else 0, FMT_THOUSANDS),  # Volume
+        _excel_cell(ws, min_funds, FMT_DECIMAL),                          # MinFunds - simple number format to avoid green triangles
+        _excel_cell(ws, supertrend_stats['avg_long_session_pct'], FMT_DECIMAL),
+        _excel_cell(ws, supertrend_stats['max_long_session_pct'], FMT_DECIMAL),
+        _excel_cell(ws, supertrend_stats['avg_short_session_pct'], FMT_DECIMAL),
+        _excel_cell(ws, supertrend_stats['max_short_session_pct'], FMT_DECIMAL),
+        _excel_cell(ws, supertrend_stats['total_sessions'], FMT_INTEGER),  # Sessions
+    ])
+
+
+def save_to_csv(pairs_data: list, output_file: str) -> bool:
+    """Write all rows to the CSV file in one pass with safe file handling. Returns True if successful, False if cancelled."""
+    header = ["Pair", "Volatility", "Volume", "MinFunds", "MedLong%", "MaxLong%", "MedShort%", "MaxShort%", "Sessions"]
+    
+    # Format: Volatility to 2 decimal places, Volume as integer with commas
+    rows = [header]
+    for pair_data in pairs_data:
+        volume = pair_data['median_volume']
+        supertrend_stats = pair_data['supertrend_stats']
+        rows.append([
+            pair_data['pair'],
+            f"{pair_data['median_pct']:.2f}",
+            f"{int(volume):,}" if volume > 0 else "0",
+            pair_data['min_mkt_funds'],
+            f"{supertrend_stats['avg_long_session_pct']:.2f}",
+            f"{supertrend_stats['max_long_session_pct']:.2f}",
+            f"{supertrend_stats['avg_short_session_pct']:.2f}",
+            f"{supertrend_stats['max_short_session_pct']:.2f}",
+            supertrend_stats['total_sessions']
+        ])
     
-    def sort_operation():
-        with open(output_file, "r", encoding="utf-8") as f:
-            rows = list(csv.reader(f))
-        if not rows:
-            return True
-        header, data = rows[0], rows[1:]
-        # Sort by volatility (column 1), parsing the formatted string back to float
-        data.sort(key=lambda r: float(r[1]), reverse=True)
+    def write_operation():
         with open(output_file, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(header)
-            writer.writerows(data)
+            csv.writer(f).writerows(rows)
         return True
     
-    return safe_file_operation(sort_operation, output_file, "sort CSV file")
+    return safe_file_operation(write_operation, output_file, "write to CSV file")
 
 
 # ----------------------------
 # SuperTrend Analysis
 # ----------------------------
+def empty_supertrend_stats() -> dict:
+    """SuperTrend statistics for a pair with no analysis (skipped or insufficient data)."""
+    return {
+        'avg_long_session_pct': 0.0,
+        'max_long_session_pct': 0.0,
+        'avg_short_session_pct': 0.0,
+        'max_short_session_pct': 0.0,
+        'total_sessions': 0,
+        'long_sessions': 0,
+        'short_sessions': 0
+    }
+
+
+@njit(cache=True, nogil=True)
+def _rma_nb(values, length, seed):
+    """
+    Numba kernel for Wilder's RMA over values[length - 1:], starting from seed.
+    
+    RMA = (RMA_prev * (length-1) + current_value) / length
+    """
+    out = np.empty(len(values) - length + 1)
+    out[0] = seed
+    for i in range(1, len(out)):
+        out[i] = (out[i - 1] * (length - 1) + values[length - 1 + i]) / length
+    return out
+
+
 def calculate_atr(high, low, close, length=10):
     """Calculate Average True Range (ATR) for SuperTrend calculation using RMA (Wilder's smoothing)."""
     if len(high) < length + 1:
         return None
     
-    tr_list = []
-    for i in range(1, len(high)):
-        tr1 = high[i] - low[i]
-        tr2 = abs(high[i] - close[i-1])
-        tr3 = abs(low[i] - close[i-1])
-        tr_list.append(max(tr1, tr2, tr3))
-    
-    # Calculate ATR using RMA (Wilder's smoothing) - matches TradingView default
-    atr_values = []
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
     
-    # First ATR value is simple average
-    first_atr = sum(tr_list[:length]) / length
-    atr_values.append(first_atr)
+    # True Range for every candle after the first, computed in one vectorized pass
+    prev_close = close[:-1]
+    tr = np.maximum.reduce([
+        high[1:] - low[1:],
+        np.abs(high[1:] - prev_close),
+        np.abs(low[1:] - prev_close),
+    ])
     
-    # Subsequent values use RMA formula: RMA = (RMA_prev * (length-1) + current_value) / length
-    for i in range(length, len(tr_list)):
-        prev_atr = atr_values[-1]
-        current_tr = tr_list[i]
-        rma_atr = (prev_atr * (length - 1) + current_tr) / length
-        atr_values.append(rma_atr)
-    
-    return atr_values
+    # Calculate ATR using RMA (Wilder's smoothing) - matches TradingView default.
+    # RMA is recursive, so it runs in a Numba kernel; the first value is a simple
+    # average, computed here so it keeps NumPy's summation order.
+    return _rma_nb(tr, length, tr[:length].sum() / length)
 
 
-def calculate_supertrend(high, low, close, factor=3, atr_length=10):
+@njit(cache=True, nogil=True)
+def _calculate_supertrend_nb(close, basic_upper, basic_lower, atr_length):
     """
-    Calculate SuperTrend indicator.
+    Numba kernel for the SuperTrend recurrence. Expects contiguous float64 arrays.
     
-    Args:
-        high, low, close: Price arrays
-        factor: SuperTrend factor (default: 3)
-        atr_length: ATR period (default: 10)
-    
-    Returns:
-        tuple: (supertrend_line, trend_direction, signals)
-            - supertrend_line: SuperTrend line values
-            - trend_direction: 1 for uptrend, -1 for downtrend
-            - signals: 1 for buy signal, -1 for sell signal, 0 for no signal
+    basic_upper/basic_lower hold the precomputed bands for candles atr_length onwards.
     """
-    if len(high) < atr_length + 1:
-        return None, None, None
-    
-    # Calculate ATR
-    atr_values = calculate_atr(high, low, close, atr_length)
-    if not atr_values:
-        return None, None, None
+    n = len(close)
     
     # Initialize arrays
-    supertrend_line = [None] * len(close)
-    trend_direction = [0] * len(close)
-    signals = [0] * len(close)
-    
-    # Calculate basic upper and lower bands
-    basic_upper = []
-    basic_lower = []
-    
-    for i in range(atr_length, len(close)):
-        atr_idx = i - atr_length
-        basic_upper.append((high[i] + low[i]) / 2 + factor * atr_values[atr_idx])
-        basic_lower.append((high[i] + low[i]) / 2 - factor * atr_values[atr_idx])
+    supertrend_line = np.full(n, np.nan)
+    trend_direction = np.zeros(n, np.int8)
+    signals = np.zeros(n, np.int8)
     
     # Calculate final SuperTrend line
-    for i in range(atr_length, len(close)):
-        basic_upper_idx = i - atr_length
-        basic_lower_idx = i - atr_length
+    for i in range(atr_length, n):
+        band_idx = i - atr_length
         
         # Initial trend direction
         if i == atr_length:
-            if close[i] <= basic_lower[basic_lower_idx]:
+            if close[i] <= basic_lower[band_idx]:
                 trend_direction[i] = -1
-                supertrend_line[i] = basic_lower[basic_lower_idx]
+                supertrend_line[i] = basic_lower[band_idx]
             else:
                 trend_direction[i] = 1
-                supertrend_line[i] = basic_upper[basic_upper_idx]
+                supertrend_line[i] = basic_upper[band_idx]
         else:
             prev_trend = trend_direction[i-1]
             
             if prev_trend == 1:
                 # Previous trend was up
-                if basic_lower[basic_lower_idx] > supertrend_line[i-1]:
-                    supertrend_line[i] = basic_lower[basic_lower_idx]
+                if basic_lower[band_idx] > supertrend_line[i-1]:
+                    supertrend_line[i] = basic_lower[band_idx]
                 else:
                     supertrend_line[i] = supertrend_line[i-1]
             else:
                 # Previous trend was down
-                if basic_upper[basic_upper_idx] < supertrend_line[i-1]:
-                    supertrend_line[i] = basic_upper[basic_upper_idx]
+                if basic_upper[band_idx] < supertrend_line[i-1]:
+                    supertrend_line[i] = basic_upper[band_idx]
                 else:
                     supertrend_line[i] = supertrend_line[i-1]
             
@@ -425,6 +440,46 @@ def calculate_supertrend(high, low, close, factor=3, atr_length=10):
     return supertrend_line, trend_direction, signals
 
 
+def calculate_supertrend(high, low, close, factor=3, atr_length=10):
+    """
+    Calculate SuperTrend indicator.
+    
+    Args:
+        high, low, close: Price arrays
+        factor: SuperTrend factor (default: 3)
+        atr_length: ATR period (default: 10)
+    
+    Returns:
+        tuple: (supertrend_line, trend_direction, signals) as NumPy arrays
+            - supertrend_line: SuperTrend line values (NaN before the first ATR value)
+            - trend_direction: 1 for uptrend, -1 for downtrend
+            - signals: 1 for buy signal, -1 for sell signal, 0 for no signal
+    """
+    if len(high) < atr_length + 1:
+        return None, None, None
+    
+    # Calculate ATR
+    atr_values = calculate_atr(high, low, close, atr_length)
+    if atr_values is None:
+        return None, None, None
+    
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    
+    # Calculate basic upper and lower bands up front; only the recurrence needs the kernel
+    hl2 = (high[atr_length:] + low[atr_length:]) / 2
+    bands = factor * atr_values
+    basic_upper = hl2 + bands
+    basic_lower = hl2 - bands
+    
+    return _calculate_supertrend_nb(
+        np.ascontiguousarray(close, dtype=np.float64),
+        basic_upper,
+        basic_lower,
+        atr_length,
+    )
+
+
 def analyze_supertrend_sessions(high, low, close, supertrend_line, trend_direction, signals):
     """
     Analyze SuperTrend sessions to calculate % changes.
@@ -440,66 +495,29 @@ def analyze_supertrend_sessions(high, low, close, supertrend_line, trend_directi
             'short_sessions': number of short sessions
         }
     """
-    if not signals or not any(signals):
-        return {
-            'avg_long_session_pct': 0.0,
-            'max_long_session_pct': 0.0,
-            'avg_short_session_pct': 0.0,
-            'max_short_session_pct': 0.0,
-            'total_sessions': 0,
-            'long_sessions': 0,
-            'short_sessions': 0
-        }
+    if signals is None or not np.any(signals):
+        return empty_supertrend_stats()
     
-    long_session_changes = []
-    short_session_changes = []
-    current_session_start = None
-    current_session_type = None
-    current_session_high = None
-    current_session_low = None
-    
-    for i, signal in enumerate(signals):
-        if signal != 0:  # New session starts
-            # Close previous session if exists
-            if current_session_start is not None and current_session_type is not None:
-                if current_session_type == 1:  # Long session
-                    if current_session_high is not None:
-                        session_change = ((current_session_high - close[current_session_start]) / close[current_session_start]) * 100
-                        long_session_changes.append(session_change)
-                else:  # Short session
-                    if current_session_low is not None:
-                        session_change = ((close[current_session_start] - current_session_low) / close[current_session_start]) * 100
-                        short_session_changes.append(session_change)
-            
-            # Start new session
-            current_session_start = i
-            current_session_type = signal
-            current_session_high = high[i]
-            current_session_low = low[i]
-        
-        # Update session high/low
-        if current_session_start is not None:
-            if high[i] > current_session_high:
-                current_session_high = high[i]
-            if low[i] < current_session_low:
-                current_session_low = low[i]
-    
-    # Close final session
-    if current_session_start is not None and current_session_type is not None:
-        if current_session_type == 1:  # Long session
-            if current_session_high is not None:
-                session_change = ((current_session_high - close[current_session_start]) / close[current_session_start]) * 100
-                long_session_changes.append(session_change)
-        else:  # Short session
-            if current_session_low is not None:
-                session_change = ((close[current_session_start] - current_session_low) / close[current_session_start]) * 100
-                short_session_changes.append(session_change)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    signals = np.asarray(signals)
+    
+    # Each signal starts a session that runs until the next signal (or the end of the data)
+    starts = np.flatnonzero(signals != 0)
+    session_highs = np.maximum.reduceat(high, starts)
+    session_lows = np.minimum.reduceat(low, starts)
+    entry_close = close[starts]
+    
+    long_mask = signals[starts] == 1
+    long_session_changes = (session_highs[long_mask] - entry_close[long_mask]) / entry_close[long_mask] * 100
+    short_session_changes = (entry_close[~long_mask] - session_lows[~long_mask]) / entry_close[~long_mask] * 100
     
     # Calculate statistics
-    median_long = float(np.median(long_session_changes)) if long_session_changes else 0.0
-    max_long = float(np.max(long_session_changes)) if long_session_changes else 0.0
-    median_short = float(np.median(short_session_changes)) if short_session_changes else 0.0
-    max_short = float(np.max(short_session_changes)) if short_session_changes else 0.0
+    median_long = fast_median(long_session_changes)
+    max_long = float(np.max(long_session_changes)) if long_session_changes.size else 0.0
+    median_short = fast_median(short_session_changes)
+    max_short = float(np.max(short_session_changes)) if short_session_changes.size else 0.0
     
     return {
         'avg_long_session_pct': median_long,
@@ -512,7 +530,7 @@ def analyze_supertrend_sessions(high, low, close, supertrend_line, trend_directi
     }
 
 
-def get_30min_candles(pair: str, start: datetime, end: datetime):
+async def get_30min_candles(session: aiohttp.ClientSession, limiter: "AsyncRateLimiter", pair: str, start: datetime, end: datetime):
     """Get 30-minute candles for SuperTrend analysis with chunked requests."""
     url = f"{BASE_URL}/products/{pair}/candles"
     all_data = []
@@ -536,18 +554,18 @@ def get_30min_candles(pair: str, start: datetime, end: datetime):
                 "granularity": 1800,  # 30 minutes = 1800 seconds
             }
             
-            resp = requests.get(url, headers=HEADERS, params=params, timeout=30)
-            
-            if resp.status_code == 400:
+            try:
+                data = await api_get(session, limiter, url, params)
+            except aiohttp.ClientResponseError as e:
+                if e.status != 400:
+                    raise
                 # If 30-minute fails, try 1-hour granularity
                 params["granularity"] = 3600  # 1 hour = 3600 seconds
-                resp = requests.get(url, headers=HEADERS, params=params, timeout=30)
-                if resp.status_code != 200:
+                try:
+                    data = await api_get(session, limiter, url, params)
+                except aiohttp.ClientResponseError:
                     print(f"Warning: {pair} doesn't support 30-minute or 1-hour granularity")
                     return []
-            
-            resp.raise_for_status()
-            data = resp.json()
 
             if not isinstance(data, list):
                 msg = data.get("message", "Unknown error format")
@@ -556,24 +574,16 @@ def get_30min_candles(pair: str, start: datetime, end: datetime):
             all_data.extend(data)
             current_start = current_end
             request_count += 1
-            
-            # Rate limiting
-            time.sleep(RATE_LIMIT_SLEEP)
 
-        # Remove duplicates and sort
-        unique_data = []
-        seen_timestamps = set()
+        # Remove duplicates (chunk boundaries overlap by one candle), keeping the first seen
+        unique_data = {}
         for candle in all_data:
-            timestamp = candle[0]
-            if timestamp not in seen_timestamps:
-                unique_data.append(candle)
-                seen_timestamps.add(timestamp)
+            unique_data.setdefault(candle[0], candle)
         
-        unique_data.sort(key=lambda r: r[0])  # oldest -> newest
-        return unique_data
+        return sorted(unique_data.values(), key=itemgetter(0))  # oldest -> newest
         
-    except requests.HTTPError as e:
-        if "400" in str(e):
+    except aiohttp.ClientResponseError as e:
+        if e.status == 400:
             print(f"Warning: {pair} API limitation - returning empty data")
             return []
         raise
@@ -582,186 +592,346 @@ def get_30min_candles(pair: str, start: datetime, end: datetime):
         return []
 
 
-def get_supertrend_stats(pair: str, start: datetime, end: datetime, factor=3, atr_length=10):
+def compute_supertrend_stats(candles, factor=3, atr_length=10):
+    """
+    Compute SuperTrend session statistics from already-fetched candles.
+    
+    Pure CPU work (NumPy + Numba), safe to run in a worker thread.
+    
+    Returns:
+        dict: SuperTrend session statistics
+    """
+    if len(candles) < atr_length + 10:  # Need minimum data for analysis
+        return empty_supertrend_stats()
+    
+    # Extract OHLC data
+    candles = np.asarray(candles, dtype=np.float64)
+    high = candles[:, 2]   # high is at index 2
+    low = candles[:, 3]    # low is at index 3
+    close = candles[:, 4]  # close is at index 4
+    
+    # Calculate SuperTrend
+    supertrend_line, trend_direction, signals = calculate_supertrend(
+        high, low, close, factor, atr_length
+    )
+    
+    if supertrend_line is None:
+        return empty_supertrend_stats()
+    
+    # Analyze sessions
+    return analyze_supertrend_sessions(
+        high, low, close, supertrend_line, trend_direction, signals
+    )
+
+
+async def get_supertrend_stats(session: aiohttp.ClientSession, limiter: "AsyncRateLimiter", pair: str, start: datetime, end: datetime, executor: ThreadPoolExecutor = None, factor=3, atr_length=10):
     """
     Get SuperTrend statistics for a trading pair.
     
+    The analysis runs on executor so other pairs keep downloading meanwhile.
+    
     Returns:
         dict: SuperTrend session statistics
     """
     try:
         # Get 30-minute candles
-        candles = get_30min_candles(pair, start, end)
-        
-        if len(candles) < atr_length + 10:  # Need minimum data for analysis
-            return {
-                'avg_long_session_pct': 0.0,
-                'max_long_session_pct': 0.0,
-                'avg_short_session_pct': 0.0,
-                'max_short_session_pct': 0.0,
-                'total_sessions': 0,
-                'long_sessions': 0,
-                'short_sessions': 0
-            }
+        candles = await get_30min_candles(session, limiter, pair, start, end)
         
-        # Extract OHLC data
-        high = [float(row[2]) for row in candles]  # high is at index 2
-        low = [float(row[3]) for row in candles]    # low is at index 3
-        close = [float(row[4]) for row in candles] # close is at index 4
-        
-        # Calculate SuperTrend
-        supertrend_line, trend_direction, signals = calculate_supertrend(
-            high, low, close, factor, atr_length
-        )
-        
-        if supertrend_line is None:
-            return {
-                'avg_long_session_pct': 0.0,
-                'max_long_session_pct': 0.0,
-                'avg_short_session_pct': 0.0,
-                'max_short_session_pct': 0.0,
-                'total_sessions': 0,
-                'long_sessions': 0,
-                'short_sessions': 0
-            }
-        
-        # Analyze sessions
-        session_stats = analyze_supertrend_sessions(
-            high, low, close, supertrend_line, trend_direction, signals
-        )
-        
-        return session_stats
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, compute_supertrend_stats, candles, factor, atr_length)
         
     except Exception as e:
         print(f"Error calculating SuperTrend for {pair}: {e}")
-        return {
-            'avg_long_session_pct': 0.0,
-            'max_long_session_pct': 0.0,
-            'avg_short_session_pct': 0.0,
-            'max_short_session_pct': 0.0,
-            'total_sessions': 0,
-            'long_sessions': 0,
-            'short_sessions': 0
-        }
+        return empty_supertrend_stats()
 
 
 # ----------------------------
 # Coinbase API
 # ----------------------------
-def get_active_pairs(quote_currency: str = "USD"):
-    url = f"{BASE_URL}/products"
-    resp = requests.get(url, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    products = resp.json()
-
-    active = []
-    # Convert to uppercase for consistent matching
-    quote_currency_upper = quote_currency.upper()
-    quote_suffix = f"-{quote_currency_upper}"
+class AsyncRateLimiter:
+    """
+    Token bucket that spaces out request starts to stay under the API rate limit.
     
-    for p in products:
-        if p.get("trading_disabled"):
-            continue
-        if p.get("cancel_only"):
-            continue
-        if p.get("status") not in (None, "online", "active", "online_trading"):
-            continue
+    Create one per event loop (analyze_pairs makes one per run); its lock is bound
+    to the loop it is first used on.
+    """
 
-        product_id = p.get("id") or p.get("product_id")
-        if not product_id:
-            continue
+    def __init__(self, max_rate: float, time_period: float = 1.0):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = max_rate
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                elapsed = now - self._last_refill
+                self._tokens = min(self.max_rate, self._tokens + elapsed * self.max_rate / self.time_period)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.time_period / self.max_rate)
 
-        if not product_id.endswith(quote_suffix):
-            continue
 
-        active.append(product_id)
+def parse_retry_after(value) -> float:
+    """Parse a Retry-After header given in seconds. Returns 0.0 if missing or not numeric."""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
 
-    return sorted(set(active))
 
+async def api_get(session: aiohttp.ClientSession, limiter: AsyncRateLimiter, url: str, params: dict = None):
+    """
+    Rate-limited GET against the Coinbase API. Returns the JSON body decoded with orjson.
+    
+    Rate-limit (429) and transient 5xx responses, as well as dropped connections,
+    are retried up to MAX_RETRIES times with exponential backoff, waiting longer
+    if the server sends a Retry-After header.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        delay = RETRY_BACKOFF * 2 ** attempt
+        await limiter.acquire()
+        try:
+            async with session.get(url, params=params) as resp:
+                if resp.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    resp.raise_for_status()
+                    return orjson.loads(await resp.read())
+                delay = max(delay, parse_retry_after(resp.headers.get("Retry-After")))
+        except aiohttp.ClientConnectionError:
+            if attempt == MAX_RETRIES:
+                raise
+        await asyncio.sleep(delay)
+
+
+def _is_tradable(product: dict) -> bool:
+    """True if a /products entry is online and accepting orders."""
+    return (
+        not product.get("trading_disabled")
+        and not product.get("cancel_only")
+        and product.get("status") in _VALID_STATUS
+    )
 
-def get_pair_info(pair: str):
-    url = f"{BASE_URL}/products/{pair}"
-    resp = requests.get(url, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    product_info = resp.json()
-    return product_info.get("min_market_funds", None)
 
+async def get_active_pairs(session: aiohttp.ClientSession, limiter: AsyncRateLimiter, quote_currency: str = "USD"):
+    # The full product list is cached (for every quote currency) for PRODUCTS_CACHE_TTL
+    products = cache_get("products", "all", PRODUCTS_CACHE_TTL)
+    if products is _CACHE_MISS:
+        url = f"{BASE_URL}/products"
+        products = await api_get(session, limiter, url)
+        cache_set("products", "all", products)
 
-def get_daily_volume(pair: str, start: datetime, end: datetime):
-    """Get the median daily volume over the specified period"""
-    url = f"{BASE_URL}/products/{pair}/candles"
-    params = {
-        "start": iso_format(start),
-        "end": iso_format(end),
-        "granularity": GRANULARITY,
-    }
-    resp = requests.get(url, headers=HEADERS, params=params, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
+    # Convert to uppercase for consistent matching
+    quote_suffix = f"-{quote_currency.upper()}"
+
+    # Product IDs are unique, so a plain sort is enough (no set() round-trip)
+    return sorted(
+        product_id
+        for p in products
+        if _is_tradable(p)
+        and (product_id := p.get("id") or p.get("product_id"))
+        and product_id.endswith(quote_suffix)
+    )
 
-    if not isinstance(data, list):
-        msg = data.get("message", "Unknown error format")
-        raise RuntimeError(f"Candles error for {pair}: {msg}")
 
-    if not data:
-        return 0.0
+async def get_24h_volumes(session: aiohttp.ClientSession, limiter: AsyncRateLimiter) -> dict:
+    """Get the rolling 24h volume of every product from the bulk /products/stats endpoint."""
+    url = f"{BASE_URL}/products/stats"
+    stats = await api_get(session, limiter, url)
 
-    # Calculate median daily volume (volume is at index 5 in the candles data)
-    volumes = [float(row[5]) for row in data if len(row) > 5]
-    return float(np.median(volumes)) if volumes else 0.0
+    volumes = {}
+    for product_id, product_stats in stats.items():
+        try:
+            volumes[product_id] = float(product_stats["stats_24hour"]["volume"])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return volumes
 
 
-def get_daily_ohlc(pair: str, start: datetime, end: datetime):
+async def get_pair_info(session: aiohttp.ClientSession, limiter: AsyncRateLimiter, pair: str):
+    """Get min_market_funds for a pair, cached on disk for PAIR_INFO_CACHE_TTL."""
+    cached = cache_get("pair_info", pair, PAIR_INFO_CACHE_TTL)
+    if cached is not _CACHE_MISS:
+        return cached
+
+    url = f"{BASE_URL}/products/{pair}"
+    product_info = await api_get(session, limiter, url)
+    min_market_funds = product_info.get("min_market_funds", None)
+    cache_set("pair_info", pair, min_market_funds)
+    return min_market_funds
+
+
+async def get_daily_ohlc(session: aiohttp.ClientSession, limiter: AsyncRateLimiter, pair: str, start: datetime, end: datetime):
+    """
+    Daily candles for the window as a float64 array of [time, low, high, open, close, volume]
+    rows, ordered newest -> oldest.
+    """
     url = f"{BASE_URL}/products/{pair}/candles"
     params = {
         "start": iso_format(start),
         "end": iso_format(end),     # end at UTC midnight -> no partial candle
         "granularity": GRANULARITY,
     }
-    resp = requests.get(url, headers=HEADERS, params=params, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
+    data = await api_get(session, limiter, url, params)
 
     if not isinstance(data, list):
         msg = data.get("message", "Unknown error format")
         raise RuntimeError(f"Candles error for {pair}: {msg}")
 
-    data.sort(key=lambda r: r[0])  # oldest -> newest
-    return data
+    if not data:
+        return np.empty((0, 6))
+    candles = np.asarray(data, dtype=np.float64)
+
+    # Coinbase already returns newest -> oldest; only sort if a response doesn't
+    times = candles[:, 0]
+    if np.any(times[1:] > times[:-1]):
+        candles = candles[np.argsort(-times, kind="stable")]
+    return candles
 
 
 # ----------------------------
-# Main
+# Analysis pipeline
 # ----------------------------
-def main(volatility_threshold: float = 2.0, days: int = 90, output_file: str = "volatility.xlsx", volume_threshold: float = 1000000.0, output_format: str = "excel", quote_currency: str = "USD", supertrend_count: int = 0):
-    try:
-        # Normalize quote currency to uppercase for consistency
-        quote_currency = quote_currency.upper()
-        
-        # Calculate date window based on days parameter
-        end_date = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        start_date = end_date - timedelta(days=days)  # inclusive start
-        
-        print(f"Window: {start_date.isoformat()} to {end_date.isoformat()} (UTC), {days} FULL daily candles expected.")
-        print(f"Using volatility threshold: {volatility_threshold}%")
-        print(f"Using volume threshold: {volume_threshold:,.0f}")
-        print(f"Quote currency: {quote_currency}")
-        print(f"Output format: {output_format.upper()}")
-        print(f"Output file: {output_file}")
-        if supertrend_count > 0:
-            print(f"📊 SuperTrend Analysis: Top {supertrend_count} coins, 30-min candles, Factor 3, ATR Length 10")
-        else:
-            print("📊 SuperTrend Analysis: Disabled (use --supertrend N to enable)")
-        print("Press Ctrl+C at any time to cancel the operation, or type 'q' when prompted.\n")
-        
-        # Safely remove existing file if it exists
-        if not safe_remove_file(output_file):
-            print("❌ Cannot proceed without removing the existing file.")
-            return
+async def process_pair(session: aiohttp.ClientSession, limiter: AsyncRateLimiter, semaphore: asyncio.Semaphore, pair: str, start_date: datetime, end_date: datetime, days: int, volatility_threshold: float, volume_threshold: float, verbose: bool = False):
+    """
+    Phase 1 work for a single pair: fetch daily data and apply the volatility/volume filters.
+    
+    Per-pair diagnostics are only collected when verbose; warnings and errors always are.
+    
+    Returns:
+        tuple: (pair, pair_data or None if filtered out, log messages)
+    """
+    messages = []
+    async with semaphore:
+        try:
+            candles = await get_daily_ohlc(session, limiter, pair, start_date, end_date)
+
+            # Enforce at least the required number of FULL daily candles
+            if len(candles) < days:
+                if verbose:
+                    messages.append(f"  Skipping {pair}: only {len(candles)} full day(s) of history in the {days}-day window.")
+                return pair, None, messages
+
+            # Per-day % range median, volume median and daily ATR proxy in one pass
+            median_pct, median_volume, daily_atr_pct = _daily_stats_nb(candles, days)
+
+            # Exclude under-threshold medians
+            if median_pct < volatility_threshold:
+                if verbose:
+                    messages.append(f"  Skipping {pair}: median {median_pct:.4f}% < {volatility_threshold:.2f}% threshold.")
+                return pair, None, messages
+
+            if verbose:
+                messages.append(f"  Median daily range% ({days}d): {median_pct:.4f}")
+                messages.append(f"  Median daily volume: {median_volume:,.2f}")
+
+            # Exclude under-threshold volumes
+            if median_volume < volume_threshold:
+                if verbose:
+                    messages.append(f"  Skipping {pair}: median volume {median_volume:,.2f} < {volume_threshold:,.0f} threshold.")
+                return pair, None, messages
+
+            # Get minimum market funds
+            try:
+                min_mkt_funds = await get_pair_info(session, limiter, pair)
+            except Exception as e:
+                messages.append(f"  Warning: could not fetch min_market_funds for {pair}: {e}")
+                min_mkt_funds = "N/A"
+
+            if verbose:
+                messages.append(f"  ✅ {pair} qualified for analysis")
+            return pair, {
+                'pair': pair,
+                'median_pct': median_pct,
+                'median_volume': median_volume,
+                'min_mkt_funds': min_mkt_funds,
+                'daily_atr_pct': daily_atr_pct,
+                'supertrend_stats': empty_supertrend_stats()
+            }, messages
+
+        except aiohttp.ClientResponseError as e:
+            messages.append(f"HTTP error for {pair}: {e.status} {e.message}")
+        except Exception as e:
+            messages.append(f"Error for {pair}: {e}")
+    return pair, None, messages
+
 
-        active_pairs = get_active_pairs(quote_currency)
+async def process_supertrend(session: aiohttp.ClientSession, limiter: AsyncRateLimiter, semaphore: asyncio.Semaphore, executor: ThreadPoolExecutor, pair_data: dict, start_date: datetime, end_date: datetime, min_daily_atr_pct: float = 0.0, verbose: bool = False):
+    """
+    Phase 2 work for a single pair: attach SuperTrend stats to pair_data.
+    
+    Pairs whose daily ATR proxy is below min_daily_atr_pct keep empty stats and
+    skip the 30-minute candle download entirely. Per-pair diagnostics are only
+    collected when verbose; failures always are.
+    
+    Returns:
+        tuple: (pair, log messages)
+    """
+    pair = pair_data['pair']
+    messages = []
+    if pair_data['daily_atr_pct'] < min_daily_atr_pct:
+        pair_data['supertrend_stats'] = empty_supertrend_stats()
+        if verbose:
+            messages.append(f"  SuperTrend: Skipped, daily ATR proxy {pair_data['daily_atr_pct']:.2f}% < {min_daily_atr_pct:.2f}%")
+        return pair, messages
+
+    async with semaphore:
+        try:
+            supertrend_stats = await get_supertrend_stats(session, limiter, pair, start_date, end_date, executor)
+            pair_data['supertrend_stats'] = supertrend_stats
+
+            if verbose:
+                if supertrend_stats['total_sessions'] > 0:
+                    messages.append(f"  SuperTrend: {supertrend_stats['total_sessions']} sessions, "
+                                    f"Med Long: {supertrend_stats['avg_long_session_pct']:.2f}%, "
+                                    f"Max Long: {supertrend_stats['max_long_session_pct']:.2f}%, "
+                                    f"Med Short: {supertrend_stats['avg_short_session_pct']:.2f}%, "
+                                    f"Max Short: {supertrend_stats['max_short_session_pct']:.2f}%")
+                else:
+                    messages.append(f"  SuperTrend: No sufficient data for analysis")
+
+        except Exception as e:
+            messages.append(f"  SuperTrend: No data available for {pair}")
+    return pair, messages
+
+
+async def analyze_pairs(quote_currency: str, start_date: datetime, end_date: datetime, days: int, volatility_threshold: float, volume_threshold: float, supertrend_count: int, supertrend_min_range: float = 0.0, verbose: bool = False):
+    """
+    Run Phase 1 (daily filters) and Phase 2 (SuperTrend) concurrently over all active pairs.
+    
+    All requests share one HTTP session and one AsyncRateLimiter created for
+    this run; at most MAX_CONCURRENCY pairs are in flight at once. Per-pair
+    progress lines are only printed when verbose.
+    
+    Returns:
+        list: qualifying pair dicts
+    """
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        # Per-run limiter: asyncio primitives are bound to the loop asyncio.run() creates
+        limiter = AsyncRateLimiter(RATE_LIMIT)
+
+        active_pairs = await get_active_pairs(session, limiter, quote_currency)
         print(f"Found {len(active_pairs)} active -{quote_currency} pairs.")
 
+        # Pre-filter: one bulk 24h stats request skips clearly illiquid pairs before
+        # paying for their daily candles. Pairs missing from the stats are kept.
+        try:
+            volumes_24h = await get_24h_volumes(session, limiter)
+        except Exception as e:
+            print(f"Warning: could not fetch 24h stats, skipping volume pre-filter: {e}")
+            volumes_24h = {}
+        min_24h_volume = volume_threshold * PREFILTER_VOLUME_FACTOR
+        candidate_pairs = [p for p in active_pairs if volumes_24h.get(p, min_24h_volume) >= min_24h_volume]
+        if len(candidate_pairs) < len(active_pairs):
+            print(f"Pre-filter: skipping {len(active_pairs) - len(candidate_pairs)} pairs with 24h volume < {min_24h_volume:,.0f}.")
+        active_pairs = candidate_pairs
+
         # Phase 1: Collect all qualifying pairs with daily data
         print("\n🔍 Phase 1: Analyzing daily volatility and volume...")
         qualifying_pairs = []
@@ -777,86 +947,23 @@ def main(volatility_threshold: float = 2.0, days: int = 90, output_file: str = "
             dynamic_ncols=True
         )
 
-        for i, pair in enumerate(active_pairs, start=1):
-            try:
-                tqdm.write(f"[{i}/{len(active_pairs)}] Fetching {pair} ...")
-                ohlc = get_daily_ohlc(pair, start_date, end_date)
-
-                # Enforce at least the required number of FULL daily candles
-                if len(ohlc) < days:
-                    tqdm.write(f"  Skipping {pair}: only {len(ohlc)} full day(s) of history in the {days}-day window.")
-                    progress_bar.update(1)
-                    time.sleep(RATE_LIMIT_SLEEP)
-                    continue
-
-                # Compute per-day % range, then the median
-                pct_changes = []
-                for row in ohlc[-days:]:
-                    _, low, high, *_ = row
-                    pct_changes.append(calculate_percentage_change(float(low), float(high)))
-
-                median_pct = float(np.median(pct_changes)) if pct_changes else 0.0
-
-                # Exclude under-threshold medians
-                if median_pct < volatility_threshold:
-                    tqdm.write(f"  Skipping {pair}: median {median_pct:.4f}% < {volatility_threshold:.2f}% threshold.")
-                    progress_bar.update(1)
-                    time.sleep(RATE_LIMIT_SLEEP)
-                    continue
-
-                tqdm.write(f"  Median daily range% ({days}d): {median_pct:.4f}")
-
-                # Get median daily volume
-                try:
-                    median_volume = get_daily_volume(pair, start_date, end_date)
-                    tqdm.write(f"  Median daily volume: {median_volume:,.2f}")
-                except Exception as e:
-                    tqdm.write(f"  Warning: could not fetch volume for {pair}: {e}")
-                    median_volume = 0.0
-
-                # Exclude under-threshold volumes
-                if median_volume < volume_threshold:
-                    tqdm.write(f"  Skipping {pair}: median volume {median_volume:,.2f} < {volume_threshold:,.0f} threshold.")
-                    progress_bar.update(1)
-                    time.sleep(RATE_LIMIT_SLEEP)
-                    continue
-
-                # Get minimum market funds
-                try:
-                    min_mkt_funds = get_pair_info(pair)
-                except Exception as e:
-                    tqdm.write(f"  Warning: could not fetch min_market_funds for {pair}: {e}")
-                    min_mkt_funds = "N/A"
-
-                # Store qualifying pair data
-                qualifying_pairs.append({
-                    'pair': pair,
-                    'median_pct': median_pct,
-                    'median_volume': median_volume,
-                    'min_mkt_funds': min_mkt_funds,
-                    'supertrend_stats': {
-                        'avg_long_session_pct': 0.0,
-                        'max_long_session_pct': 0.0,
-                        'avg_short_session_pct': 0.0,
-                        'max_short_session_pct': 0.0,
-                        'total_sessions': 0,
-                        'long_sessions': 0,
-                        'short_sessions': 0
-                    }
-                })
-
-                tqdm.write(f"  ✅ {pair} qualified for analysis")
-
-            except requests.HTTPError as e:
-                tqdm.write(f"HTTP error for {pair}: {e} | Response: {getattr(e, 'response', None)}")
-            except Exception as e:
-                tqdm.write(f"Error for {pair}: {e}")
-
-            progress_bar.update(1)
-            time.sleep(RATE_LIMIT_SLEEP)
-
-        # Close Phase 1 progress bar
-        progress_bar.close()
+        tasks = [
+            process_pair(session, limiter, semaphore, pair, start_date, end_date, days, volatility_threshold, volume_threshold, verbose)
+            for pair in active_pairs
+        ]
+        try:
+            for i, task in enumerate(asyncio.as_completed(tasks), start=1):
+                pair, pair_data, messages = await task
+                if verbose or messages:
+                    tqdm.write(f"[{i}/{len(active_pairs)}] Fetched {pair}")
+                    for message in messages:
+                        tqdm.write(message)
+                if pair_data is not None:
+                    qualifying_pairs.append(pair_data)
+                progress_bar.update(1)
+        finally:
+            # Close Phase 1 progress bar
+            progress_bar.close()
         
         print(f"\n✅ Phase 1 Complete: {len(qualifying_pairs)} pairs qualified")
         
@@ -879,57 +986,73 @@ def main(volatility_threshold: float = 2.0, days: int = 90, output_file: str = "
                 dynamic_ncols=True
             )
             
-            for i, pair_data in enumerate(top_pairs, start=1):
-                pair = pair_data['pair']
+            # Downloads stay on the event loop; the SuperTrend math runs on worker threads
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                tasks = [
+                    process_supertrend(session, limiter, semaphore, executor, pair_data, start_date, end_date, supertrend_min_range, verbose)
+                    for pair_data in top_pairs
+                ]
                 try:
-                    tqdm.write(f"[{i}/{len(top_pairs)}] SuperTrend analysis for {pair} ...")
-                    
-                    # Get SuperTrend analysis
-                    supertrend_stats = get_supertrend_stats(pair, start_date, end_date)
-                    pair_data['supertrend_stats'] = supertrend_stats
-                    
-                    if supertrend_stats['total_sessions'] > 0:
-                        tqdm.write(f"  SuperTrend: {supertrend_stats['total_sessions']} sessions, "
-                                  f"Med Long: {supertrend_stats['avg_long_session_pct']:.2f}%, "
-                                  f"Max Long: {supertrend_stats['max_long_session_pct']:.2f}%, "
-                                  f"Med Short: {supertrend_stats['avg_short_session_pct']:.2f}%, "
-                                  f"Max Short: {supertrend_stats['max_short_session_pct']:.2f}%")
-                    else:
-                        tqdm.write(f"  SuperTrend: No sufficient data for analysis")
-                        
-                except Exception as e:
-                    tqdm.write(f"  SuperTrend: No data available for {pair}")
-                
-                progress_bar.update(1)
-                time.sleep(RATE_LIMIT_SLEEP)
-            
-            # Close Phase 2 progress bar
-            progress_bar.close()
+                    for i, task in enumerate(asyncio.as_completed(tasks), start=1):
+                        pair, messages = await task
+                        if verbose or messages:
+                            tqdm.write(f"[{i}/{len(top_pairs)}] SuperTrend analysis for {pair}")
+                            for message in messages:
+                                tqdm.write(message)
+                        progress_bar.update(1)
+                finally:
+                    # Close Phase 2 progress bar
+                    progress_bar.close()
             print(f"✅ Phase 2 Complete: SuperTrend analysis finished")
+
+    return qualifying_pairs
+
+
+# ----------------------------
+# Main
+# ----------------------------
+def main(volatility_threshold: float = 2.0, days: int = 90, output_file: str = "volatility.xlsx", volume_threshold: float = 1000000.0, output_format: str = "excel", quote_currency: str = "USD", supertrend_count: int = 0, supertrend_min_range: float = 0.0, verbose: bool = False):
+    try:
+        # Normalize quote currency to uppercase for consistency
+        quote_currency = quote_currency.upper()
         
-        # Initialize output file based on format
-        if output_format == "excel":
-            wb = create_excel_file(output_file)
+        # Calculate date window based on days parameter
+        end_date = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        start_date = end_date - timedelta(days=days)  # inclusive start
+        
+        print(f"Window: {start_date.isoformat()} to {end_date.isoformat()} (UTC), {days} FULL daily candles expected.")
+        print(f"Using volatility threshold: {volatility_threshold}%")
+        print(f"Using volume threshold: {volume_threshold:,.0f}")
+        print(f"Quote currency: {quote_currency}")
+        print(f"Output format: {output_format.upper()}")
+        print(f"Output file: {output_file}")
+        if supertrend_count > 0:
+            print(f"📊 SuperTrend Analysis: Top {supertrend_count} coins, 30-min candles, Factor 3, ATR Length 10")
+            if supertrend_min_range > 0:
+                print(f"   Skipping SuperTrend for pairs with daily ATR proxy < {supertrend_min_range}%")
         else:
-            wb = None  # CSV mode
+            print("📊 SuperTrend Analysis: Disabled (use --supertrend N to enable)")
+        print("Press Ctrl+C at any time to cancel the operation, or type 'q' when prompted.\n")
+        
+        # Safely remove existing file if it exists
+        if not safe_remove_file(output_file):
+            print("❌ Cannot proceed without removing the existing file.")
+            return
+
+        qualifying_pairs = asyncio.run(analyze_pairs(
+            quote_currency, start_date, end_date, days, volatility_threshold, volume_threshold, supertrend_count, supertrend_min_range, verbose
+        ))
+        
+        # Sort by volatility (highest first) once, before writing - rows are emitted in this order
+        qualifying_pairs.sort(key=lambda x: x['median_pct'], reverse=True)
         
         # Save all qualifying pairs to output
         print(f"\n💾 Saving {len(qualifying_pairs)} pairs to {output_file}...")
-        for pair_data in qualifying_pairs:
-            if output_format == "excel":
+        if output_format == "excel":
+            wb = create_excel_file(qualifying_pairs)
+            for pair_data in qualifying_pairs:
                 save_to_excel(pair_data['pair'], pair_data['median_pct'], pair_data['median_volume'], 
                             pair_data['min_mkt_funds'], pair_data['supertrend_stats'], wb)
-            else:
-                if not save_to_csv(pair_data['pair'], pair_data['median_pct'], pair_data['median_volume'], 
-                                 pair_data['min_mkt_funds'], pair_data['supertrend_stats'], output_file):
-                    print("❌ Failed to save data. Operation cancelled.")
-                    return
-        
-        # Finalize output based on format
-        if output_format == "excel":
-            # Sort and format Excel file
-            sort_excel_by_volatility(wb)
-            format_excel_file(wb)
             
             # Save Excel file
             def save_excel_operation():
@@ -940,9 +1063,8 @@ def main(volatility_threshold: float = 2.0, days: int = 90, output_file: str = "
                 print("❌ Failed to save Excel file.")
                 return
         else:
-            # Sort CSV file
-            if not sort_csv_by_median(output_file):
-                print("❌ Failed to sort the CSV file. Data may be saved but not sorted.")
+            if not save_to_csv(qualifying_pairs, output_file):
+                print("❌ Failed to save data. Operation cancelled.")
                 return
         
         print(f"\n✅ Done. Results saved (and sorted) in {output_file}")
@@ -956,9 +1078,7 @@ def main(volatility_threshold: float = 2.0, days: int = 90, output_file: str = "
         
     except KeyboardInterrupt:
         print(f"\n\n🛑 Operation cancelled by user (Ctrl+C).")
-        print("Partial data may have been saved to the output file.")
-        if 'progress_bar' in locals():
-            progress_bar.close()
+        print("No results were saved.")
         sys.exit(0)
 
 
@@ -1008,9 +1128,20 @@ def parse_arguments():
         default=0,
         help="Number of top volatile coins to analyze with SuperTrend (0 = disabled, default: 0)"
     )
+    parser.add_argument(
+        "--supertrend-min-range",
+        type=float,
+        default=0.0,
+        help="Skip the 30-minute SuperTrend download for pairs whose mean daily range (as %% of close) is below this (0 = never skip, default: 0.0)"
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print per-pair details (fetched candles, medians, skip reasons, SuperTrend stats)"
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_arguments()
-    main(volatility_threshold=args.volatility, days=args.days, output_file=args.output, volume_threshold=args.volume, output_format=args.format, quote_currency=args.quote, supertrend_count=args.supertrend)
+    main(volatility_threshold=args.volatility, days=args.days, output_file=args.output, volume_threshold=args.volume, output_format=args.format, quote_currency=args.quote, supertrend_count=args.supertrend, supertrend_min_range=args.supertrend_min_range, verbose=args.verbose)